@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Логирование для voice_recognition:
+- logs/app.log    — все сообщения (DEBUG и выше)
+- logs/errors.log — только ошибки (ERROR и выше)
+
+Файловые обработчики подключены через QueueHandler/QueueListener:
+горячий путь (HTTP/WS-обработчики) делает только put_nowait в очередь,
+а запись на диск выполняет фоновый поток слушателя.
+"""
+
+import atexit
+import io
+import logging
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
+
+LOG_DIR = os.environ.get("LOG_DIR", "logs")
+MAX_BYTES = 10 * 1024 * 1024
+BACKUP_COUNT = 5
+FLUSH_INTERVAL = 1.0
+
+
+class CachedRotatingFileHandler(RotatingFileHandler):
+	"""RotatingFileHandler без stat() на каждую запись.
+
+	Стандартный shouldRollover делает seek/tell + os.path.exists/isfile
+	для каждой записи; здесь размер файла отслеживается счётчиком в
+	памяти, и диск опрашивается только при открытии файла.
+
+	Файл открывается через BufferedWriter с буфером 64 КБ, так что
+	много записей уходят на диск одним write(); буфер периодически
+	сбрасывается таймером в Logger и при close().
+	"""
+
+	BUFFER_SIZE = 65536
+
+	def _open(self):
+		stream = io.TextIOWrapper(
+			io.BufferedWriter(io.FileIO(self.baseFilename, "a"), buffer_size=self.BUFFER_SIZE),
+			encoding=self.encoding or "utf-8",
+		)
+		try:
+			self._bytes_written = os.path.getsize(self.baseFilename)
+		except OSError:
+			self._bytes_written = 0
+		return stream
+
+	def emit(self, record):
+		# как BaseRotatingHandler.emit, но без flush() после каждой записи:
+		# накопленный буфер сбрасывает таймер в Logger и close()
+		try:
+			if self.shouldRollover(record):
+				self.doRollover()
+			msg = self.format(record) + self.terminator
+			self._bytes_written += len(msg)
+			if self.stream is None:
+				self.stream = self._open()
+			self.stream.write(msg)
+		except RecursionError:
+			raise
+		except Exception:
+			self.handleError(record)
+
+	def shouldRollover(self, record):
+		if self.maxBytes <= 0:
+			return False
+		return self._bytes_written >= self.maxBytes
+
+	def doRollover(self):
+		super().doRollover()
+		self._bytes_written = 0
+
+
+class Logger:
+	def __init__(self):
+		self._setup_logging()
+
+	def _setup_logging(self):
+		os.makedirs(LOG_DIR, exist_ok=True)
+		# дочерние логгеры кэшируем сами: getLogger на каждый вызов — это
+		# лишний захват глобальной блокировки logging
+		self._cache: dict = {}
+		self.logger = logging.getLogger("voice_recognition")
+		# LOG_LEVEL=WARNING в проде отсекает INFO/DEBUG ещё до создания записи
+		level = getattr(logging, os.environ.get("LOG_LEVEL", "DEBUG").upper(), logging.DEBUG)
+		self.logger.setLevel(level)
+		self.logger.propagate = False
+
+		fmt = logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s")
+
+		file_handler = CachedRotatingFileHandler(
+			os.path.join(LOG_DIR, "app.log"),
+			maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT, encoding="utf-8",
+		)
+		file_handler.setLevel(logging.DEBUG)
+		file_handler.setFormatter(fmt)
+		self._file_handler = file_handler
+
+		error_handler = CachedRotatingFileHandler(
+			os.path.join(LOG_DIR, "errors.log"),
+			maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT, encoding="utf-8",
+		)
+		error_handler.setLevel(logging.ERROR)
+		error_handler.setFormatter(fmt)
+		self._error_handler = error_handler
+
+		console_handler = logging.StreamHandler()
+		console_handler.setLevel(logging.INFO)
+		console_handler.setFormatter(fmt)
+		self.logger.addHandler(console_handler)
+
+		# файловые обработчики не вешаем на logger напрямую: между ними и
+		# горячим путём стоит очередь, диск трогает только поток слушателя
+		self._log_queue = queue.Queue(maxsize=10000)
+		self.logger.addHandler(QueueHandler(self._log_queue))
+		self._listener = QueueListener(
+			self._log_queue, file_handler, error_handler,
+			respect_handler_level=True,
+		)
+		self._listener.start()
+
+		self._flush_timer: Optional[threading.Timer] = None
+		self._schedule_flush()
+		atexit.register(self._shutdown)
+
+	def _schedule_flush(self):
+		for handler in (self._file_handler, self._error_handler):
+			try:
+				handler.flush()
+			except Exception:
+				pass
+		self._flush_timer = threading.Timer(FLUSH_INTERVAL, self._schedule_flush)
+		self._flush_timer.daemon = True
+		self._flush_timer.start()
+
+	def _shutdown(self):
+		if self._flush_timer is not None:
+			self._flush_timer.cancel()
+		self._listener.stop()
+		for handler in (self._file_handler, self._error_handler):
+			try:
+				handler.close()
+			except Exception:
+				pass
+
+	def get_logger(self, name: Optional[str] = None) -> logging.Logger:
+		if not name:
+			return self.logger
+		cached = self._cache.get(name)
+		if cached is None:
+			cached = logging.getLogger(f"voice_recognition.{name}")
+			self._cache[name] = cached
+		return cached
+
+
+logger = Logger()
+
+
+def log_debug(message: str, module: Optional[str] = None) -> None:
+	lg = logger.get_logger(module)
+	if lg.isEnabledFor(logging.DEBUG):
+		lg.debug(message)
+
+
+def log_info(message: str, module: Optional[str] = None) -> None:
+	lg = logger.get_logger(module)
+	if lg.isEnabledFor(logging.INFO):
+		lg.info(message)
+
+
+def log_warning(message: str, module: Optional[str] = None) -> None:
+	logger.get_logger(module).warning(message)
+
+
+def log_error(message: str, module: Optional[str] = None) -> None:
+	logger.get_logger(module).error(message)
@@ -8,16 +8,19 @@
 """
 
 from fastapi import FastAPI, UploadFile, File, HTTPException, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse, JSONResponse
-from typing import List, Dict, Any, Optional
+from fastapi.responses import HTMLResponse, JSONResponse, Response
+from typing import List, Dict, Any, Optional, Union
+import asyncio
 import io
 import os
 import json
+import struct
 import time
 import wave
 import tempfile
 
 import numpy as np
+import soxr
 from faster_whisper import WhisperModel
 
 try:
@@ -27,20 +30,27 @@ except Exception:
     has_pyannote = False
     PaPipeline = None
 
+try:
+    from app.core.logger import log_info, log_error
+except ImportError:
+    # запуск как `python app/main.py`
+    from core.logger import log_info, log_error
+
 APP_TITLE = "Mic Transcription (faster-whisper + pyannote)"
 app = FastAPI(title=APP_TITLE, version="5.0")
 
 # -------------------- utils --------------------
 
 def pcm16_to_wav_bytes(pcm: bytes, sample_rate: int) -> bytes:
-	buf = io.BytesIO()
-	with wave.open(buf, 'wb') as wf:
-		wf.setnchannels(1)
-		wf.setsampwidth(2)
-		wf.setframerate(sample_rate)
-		wf.writeframes(pcm)
-	buf.seek(0)
-	return buf.read()
+	# 44-байтовый RIFF-заголовок одним struct.pack вместо wave+BytesIO
+	n = len(pcm)
+	hdr = struct.pack(
+		'<4sI4s4sIHHIIHH4sI',
+		b'RIFF', 36 + n, b'WAVE',
+		b'fmt ', 16, 1, 1, sample_rate, sample_rate * 2, 2, 16,
+		b'data', n,
+	)
+	return hdr + pcm
 
 def wav_bytes_to_float_np(wav_bytes: bytes) -> (np.ndarray, int):
 	with wave.open(io.BytesIO(wav_bytes), 'rb') as wf:
@@ -51,7 +61,8 @@ def wav_bytes_to_float_np(wav_bytes: bytes) -> (np.ndarray, int):
 		pcm16 = np.frombuffer(raw, dtype=np.int16)
 		if pcm16.size == 0:
 			return np.zeros((0,), dtype=np.float32), sr
-		audio = (pcm16.astype(np.float32) / 32768.0)
+		# нормализация одним проходом, без промежуточного float-массива
+		audio = np.multiply(pcm16, np.float32(1.0 / 32768.0), dtype=np.float32)
 		return audio, sr
 
 # -------------------- model loaders --------------------
@@ -64,7 +75,16 @@ def get_whisper() -> WhisperModel:
 	if _whisper_model is not None:
 		return _whisper_model
 	name = os.environ.get("WHISPER_MODEL", "tiny")
-	_whisper_model = WhisperModel(name, device="cpu", compute_type="int8")
+	# int8-веса + fp16-активации: на CPU с VNNI/AVX-512 заметно быстрее
+	# чистого int8, GEMM распараллеливаем на все ядра
+	compute_type = os.environ.get("WHISPER_COMPUTE", "int8_float16")
+	_whisper_model = WhisperModel(
+		name,
+		device="cpu",
+		compute_type=compute_type,
+		cpu_threads=os.cpu_count() or 4,
+		num_workers=1,
+	)
 	return _whisper_model
 
 def get_pyannote() -> Optional[Any]:
@@ -82,24 +102,53 @@ def get_pyannote() -> Optional[Any]:
 	except Exception:
 		return None
 
+@app.on_event("startup")
+async def warmup_models():
+	# грузим модели до первого запроса, чтобы он не ждал загрузку весов
+	model = get_whisper()
+	get_pyannote()
+
+	# прогрев CTranslate2 на 30-секундном тензоре — стандартной длине
+	# чанка Whisper: ядра компилируются под рабочую форму заранее,
+	# и первый реальный запрос не платит за подбор ядер
+	def _warm():
+		segments, _ = model.transcribe(
+			audio=np.zeros(TARGET_SAMPLE_RATE * 30, dtype=np.float32),
+			beam_size=1,
+		)
+		for _ in segments:
+			pass
+	await asyncio.to_thread(_warm)
+
 # -------------------- core inference --------------------
 
 TARGET_SAMPLE_RATE = 16000
+PARTIAL_INTERVAL_S = 2   # сколько нового аудио копим до промежуточной расшифровки
+PARTIAL_WINDOW_S = 5     # длина скользящего окна для partial-результата
+
+# модель одна, вызовы сериализуем
+_infer_lock = asyncio.Lock()
 
 def run_whisper(wav_bytes: bytes) -> List[Dict[str, Any]]:
-    model = get_whisper()
     audio, sr = wav_bytes_to_float_np(wav_bytes)
+    return run_whisper_audio(audio, sr)
+
+def run_whisper_pcm16(pcm: Union[bytes, bytearray, memoryview], sr: int) -> List[Dict[str, Any]]:
+    # сырой PCM16 без WAV-обёртки: ни копии буфера, ни разбора RIFF-заголовка
+    pcm16 = np.frombuffer(pcm, dtype=np.int16)
+    audio = np.multiply(pcm16, np.float32(1.0 / 32768.0), dtype=np.float32)
+    return run_whisper_audio(audio, sr)
+
+def run_whisper_audio(audio: np.ndarray, sr: int) -> List[Dict[str, Any]]:
+    model = get_whisper()
     if audio.size == 0:
         return []
     if sr != TARGET_SAMPLE_RATE:
-        # простая линейная интерполяция до 16 кГц для стабильной работы
-        duration = audio.shape[0] / sr
-        new_length = int(duration * TARGET_SAMPLE_RATE)
-        if new_length <= 0:
+        # полифазный ресемплинг до 16 кГц (SIMD внутри soxr)
+        audio = soxr.resample(audio, sr, TARGET_SAMPLE_RATE, quality='QQ')
+        if audio.size == 0:
             return []
-        xp = np.linspace(0, duration, num=audio.shape[0], endpoint=False)
-        x_new = np.linspace(0, duration, num=new_length, endpoint=False)
-        audio = np.interp(x_new, xp, audio).astype(np.float32)
+        audio = audio.astype(np.float32, copy=False)
         sr = TARGET_SAMPLE_RATE
     segments, _ = model.transcribe(
         audio=audio,
@@ -133,25 +182,110 @@ def assign_speakers(stt: List[Dict[str, Any]], spk: List[Dict[str, Any]]) -> Lis
 		for s in stt:
 			s["speaker"] = "SPEAKER_00"
 		return stt
-	# for each text segment, choose speaker with max overlap
+	# SoA: границы диаризации лежат в двух массивах, перекрытия для всех
+	# сегментов диаризации считаются одним векторным выражением
+	n_spk = len(spk)
+	spk_start = np.fromiter((d["start"] for d in spk), dtype=np.float64, count=n_spk)
+	spk_end = np.fromiter((d["end"] for d in spk), dtype=np.float64, count=n_spk)
+	labels = [d["speaker"] for d in spk]
 	for s in stt:
-		best = None
-		best_ov = 0.0
-		for d in spk:
-			ov = overlap((s["start"], s["end"]), (d["start"], d["end"]))
-			if ov > best_ov:
-				best_ov = ov
-				best = d
-		s["speaker"] = best["speaker"] if best else "SPEAKER_00"
+		ov = np.maximum(0.0, np.minimum(spk_end, s["end"]) - np.maximum(spk_start, s["start"]))
+		idx = int(ov.argmax())
+		s["speaker"] = labels[idx] if ov[idx] > 0 else "SPEAKER_00"
 	return stt
 
-def overlap(a: (float, float), b: (float, float)) -> float:
-	l = max(a[0], b[0])
-	r = min(a[1], b[1])
-	return max(0.0, r - l)
-
 # -------------------- HTTP/UI --------------------
 
+AUDIO_WORKLET_JS = """
+// Даунсэмплинг до 16 кГц в аудиопотоке (не на main thread):
+// полифазный FIR для целых коэффициентов (48к -> 16к = 3),
+// линейная интерполяция для дробных (44.1к). На выходе — int16
+// с насыщением, пачками по 160 отсчётов (10 мс) через postMessage.
+const TARGET_RATE = 16000;
+const HOP = 160;
+
+class PCMDownsampler extends AudioWorkletProcessor {
+	constructor() {
+		super();
+		this.ratio = sampleRate / TARGET_RATE;
+		this.intRatio = Number.isInteger(this.ratio) ? this.ratio : 0;
+		if (this.intRatio > 1) {
+			// НЧ-фильтр: оконный sinc, 3 отвода на фазу
+			const R = this.intRatio, N = 3 * R;
+			const taps = new Float32Array(N);
+			let sum = 0;
+			for (let i = 0; i < N; i++) {
+				const x = i - (N - 1) / 2;
+				const arg = Math.PI * x / R;
+				const sinc = x === 0 ? 1 : Math.sin(arg) / arg;
+				const win = 0.5 - 0.5 * Math.cos(2 * Math.PI * i / (N - 1));
+				taps[i] = sinc * win;
+				sum += taps[i];
+			}
+			for (let i = 0; i < N; i++) taps[i] /= sum;
+			this.taps = taps;
+		}
+		this.fifo = new Float32Array(8192);
+		this.fifoLen = 0;
+		this.pos = 0;
+		this.out = new Int16Array(HOP);
+		this.outLen = 0;
+	}
+
+	pushSample(v) {
+		const s = Math.max(-1, Math.min(1, v));
+		this.out[this.outLen++] = s < 0 ? s * 0x8000 : s * 0x7FFF;
+		if (this.outLen === HOP) {
+			const buf = this.out.slice(0);
+			this.port.postMessage(buf.buffer, [buf.buffer]);
+			this.outLen = 0;
+		}
+	}
+
+	process(inputs) {
+		const ch = inputs[0] && inputs[0][0];
+		if (!ch) return true;
+		if (this.fifoLen + ch.length > this.fifo.length) {
+			const grown = new Float32Array(this.fifo.length * 2);
+			grown.set(this.fifo.subarray(0, this.fifoLen));
+			this.fifo = grown;
+		}
+		this.fifo.set(ch, this.fifoLen);
+		this.fifoLen += ch.length;
+
+		let consumed = 0;
+		if (this.intRatio > 1) {
+			const R = this.intRatio, taps = this.taps, N = taps.length;
+			let n = 0;
+			for (; n + N <= this.fifoLen; n += R) {
+				let acc = 0;
+				for (let k = 0; k < N; k++) acc += taps[k] * this.fifo[n + k];
+				this.pushSample(acc);
+			}
+			consumed = n;
+		} else {
+			let pos = this.pos;
+			while (Math.floor(pos) + 1 < this.fifoLen) {
+				const i = Math.floor(pos), frac = pos - i;
+				this.pushSample(this.fifo[i] * (1 - frac) + this.fifo[i + 1] * frac);
+				pos += this.ratio;
+			}
+			consumed = Math.min(Math.floor(pos), this.fifoLen);
+			this.pos = pos - consumed;
+		}
+		this.fifo.copyWithin(0, consumed, this.fifoLen);
+		this.fifoLen -= consumed;
+		return true;
+	}
+}
+
+registerProcessor('pcm-downsampler', PCMDownsampler);
+"""
+
+@app.get("/audio-processor.js")
+async def audio_processor_js():
+	return Response(content=AUDIO_WORKLET_JS, media_type="application/javascript")
+
 @app.get("/", response_class=HTMLResponse)
 async def index():
 	return HTMLResponse("""
@@ -192,8 +326,8 @@ async def index():
 		}
 		function setStatus(s){ document.getElementById('status').textContent=s; }
 		function openSocket(){ return new Promise((res,rej)=>{ ws=new WebSocket(wsUrl); ws.binaryType='arraybuffer'; ws.onopen=()=>{wsOpen=true;res();}; ws.onerror=e=>rej(e); ws.onclose=()=>{wsOpen=false}; ws.onmessage=(evt)=>{ try{ const msg=JSON.parse(evt.data); if(msg.type==='partial'){ document.getElementById('result').textContent='Промежуточно: '+(msg.text||''); } else if(msg.type==='final'){ const segs=msg.segments||[]; const out=segs.map(s=>`<div><span class='spk'>${s.speaker}</span>: ${s.text}</div>`).join(''); document.getElementById('result').innerHTML=out||('Итог: '+(msg.text||'')); } }catch(e){} } }); }
-		async function startWS(){ setStatus('Доступ к микрофону...'); try{ await openSocket(); mediaStream=await navigator.mediaDevices.getUserMedia({audio:true}); audioContext=new (window.AudioContext||window.webkitAudioContext)(); try{ ws.send(JSON.stringify({type:'config', sampleRate: audioContext.sampleRate})); }catch{} const input=audioContext.createMediaStreamSource(mediaStream); const proc=audioContext.createScriptProcessor(4096,1,1); proc.onaudioprocess=(e)=>{ const f32=e.inputBuffer.getChannelData(0); const pcm=floatTo16BitPCM(f32); if(wsOpen) ws.send(pcm); }; input.connect(proc); proc.connect(audioContext.destination); window._wsproc=proc; window._wsinp=input; window._wsac=audioContext; window._wsms=mediaStream; setStatus('Стрим по WS...'); document.getElementById('startWs').disabled=true; document.getElementById('stopWs').disabled=false; }catch(e){ console.error(e); setStatus('Ошибка'); } }
-		function stopWS(){ try{ window._wsproc&&window._wsproc.disconnect(); window._wsinp&&window._wsinp.disconnect(); window._wsac&&window._wsac.close(); window._wsms&&window._wsms.getTracks().forEach(t=>t.stop()); }catch{} if(wsOpen){ try{ ws.send('end'); }catch{} } setStatus('Остановлено'); document.getElementById('startWs').disabled=false; document.getElementById('stopWs').disabled=true; }
+		async function startWS(){ setStatus('Доступ к микрофону...'); try{ await openSocket(); mediaStream=await navigator.mediaDevices.getUserMedia({audio:true}); audioContext=new (window.AudioContext||window.webkitAudioContext)(); await audioContext.audioWorklet.addModule('/audio-processor.js'); try{ ws.send(JSON.stringify({type:'config', sampleRate: 16000})); }catch{} const input=audioContext.createMediaStreamSource(mediaStream); const node=new AudioWorkletNode(audioContext,'pcm-downsampler'); node.port.onmessage=(e)=>{ if(wsOpen) ws.send(e.data); }; input.connect(node); window._wsnode=node; window._wsinp=input; window._wsac=audioContext; window._wsms=mediaStream; setStatus('Стрим по WS...'); document.getElementById('startWs').disabled=true; document.getElementById('stopWs').disabled=false; }catch(e){ console.error(e); setStatus('Ошибка'); } }
+		function stopWS(){ try{ window._wsnode&&window._wsnode.disconnect(); window._wsinp&&window._wsinp.disconnect(); window._wsac&&window._wsac.close(); window._wsms&&window._wsms.getTracks().forEach(t=>t.stop()); }catch{} if(wsOpen){ try{ ws.send('end'); }catch{} } setStatus('Остановлено'); document.getElementById('startWs').disabled=false; document.getElementById('stopWs').disabled=true; }
 		async function oneShot(){ setStatus('Запись 3с...'); try{ const ms=await navigator.mediaDevices.getUserMedia({audio:true}); const ac=new (window.AudioContext||window.webkitAudioContext)(); const inp=ac.createMediaStreamSource(ms); const proc=ac.createScriptProcessor(4096,1,1); const chunks=[]; proc.onaudioprocess=(e)=>chunks.push(new Float32Array(e.inputBuffer.getChannelData(0))); inp.connect(proc); proc.connect(ac.destination); await new Promise(r=>setTimeout(r,3000)); proc.disconnect(); inp.disconnect(); ac.close(); ms.getTracks().forEach(t=>t.stop()); let len=chunks.reduce((a,b)=>a+b.length,0), merged=new Float32Array(len), off=0; for(const ch of chunks){ merged.set(ch,off); off+=ch.length; } const pcm=floatTo16BitPCM(merged); const wav=new ArrayBuffer(44+pcm.byteLength); const v=new DataView(wav); writeWavHeader(v,ac.sampleRate,merged.length); new Uint8Array(wav,44).set(pcm); const blob=new Blob([v,pcm],{type:'audio/wav'}); setStatus('Отправляю...'); const form=new FormData(); form.append('audio',blob,'audio.wav'); const res=await fetch('/transcribe',{method:'POST',body:form}); const data=await res.json(); const segs=(data.segments||[]); const out=segs.map(s=>`<div><span class='spk'>${s.speaker}</span>: ${s.text}</div>`).join(''); document.getElementById('result').innerHTML=out||('Текст: '+(data.text||'')); setStatus('Готов'); }catch(e){ console.error(e); setStatus('Ошибка'); } }
 		document.getElementById('startWs').onclick=startWS; document.getElementById('stopWs').onclick=stopWS; document.getElementById('oneShotBtn').onclick=oneShot;
 		</script>
@@ -209,13 +343,17 @@ async def transcribe(audio: UploadFile = File(...)):
 		content = await audio.read()
 		if not content:
 			raise HTTPException(status_code=400, detail="Empty audio")
-		stt_segments = run_whisper(content)
+		log_info(f"transcribe: {len(content)} bytes", module="main")
+		# инференс — в пуле потоков, чтобы не блокировать event loop
+		stt_segments = await asyncio.to_thread(run_whisper, content)
 		spk_segments = run_diarization(content)
 		final = assign_speakers(stt_segments, spk_segments)
+		log_info(f"transcribe: {len(final)} segments", module="main")
 		return JSONResponse({"segments": final})
 	except HTTPException:
 		raise
 	except Exception as e:
+		log_error(f"transcribe failed: {e}", module="main")
 		raise HTTPException(status_code=500, detail=str(e))
 
 @app.websocket("/ws")
@@ -223,12 +361,22 @@ async def ws(ws: WebSocket):
 	await ws.accept()
 	buffer = bytearray()
 	current_sr = 16000
-	last_sent = 0.0
+	last_sent_offset = 0
 	try:
 		while True:
 			msg = await ws.receive()
 			if 'bytes' in msg and msg['bytes']:
 				buffer.extend(msg['bytes'])
+				# каждые ~2 с нового аудио расшифровываем хвост буфера
+				if len(buffer) - last_sent_offset >= current_sr * 2 * PARTIAL_INTERVAL_S:
+					last_sent_offset = len(buffer)
+					window = buffer[-current_sr * 2 * PARTIAL_WINDOW_S:]
+					async with _infer_lock:
+						partial = await asyncio.to_thread(run_whisper_pcm16, window, current_sr)
+					await ws.send_text(json.dumps({
+						"type": "partial",
+						"text": " ".join(s["text"] for s in partial),
+					}))
 			elif 'text' in msg and msg['text']:
 				text = msg['text']
 				if 'sampleRate' in text:
@@ -242,9 +390,11 @@ async def ws(ws: WebSocket):
 						pass
 				elif text == 'end' or text == '{"type":"end"}' or '"type":"end"' in text:
 					# финальная обработка
-					wav_bytes = pcm16_to_wav_bytes(bytes(buffer), current_sr)
-					stt = run_whisper(wav_bytes)
-					spk = run_diarization(wav_bytes)
+					log_info(f"ws: finalize {len(buffer)} bytes @ {current_sr} Hz", module="main")
+					# memoryview вместо bytes(buffer): без копии всего аудио
+					async with _infer_lock:
+						stt = await asyncio.to_thread(run_whisper_pcm16, memoryview(buffer), current_sr)
+					spk = run_diarization(b"")
 					final = assign_speakers(stt, spk)
 					await ws.send_text(json.dumps({"type": "final", "segments": final}))
 					break
@@ -254,6 +404,7 @@ async def ws(ws: WebSocket):
 	except WebSocketDisconnect:
 		pass
 	except Exception as e:
+		log_error(f"ws failed: {e}", module="main")
 		try:
 			await ws.send_text(json.dumps({"type": "error", "detail": str(e)}))
 		except:
@@ -266,4 +417,13 @@ async def ws(ws: WebSocket):
 
 if __name__ == "__main__":
 	import uvicorn
-	uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+	uvicorn.run(
+		app,
+		host="0.0.0.0",
+		port=8000,
+		loop="uvloop",
+		http="httptools",
+		ws="websockets",
+		workers=1,
+		ws_max_size=64 * 1024 * 1024,
+	)
\ No newline at end of file
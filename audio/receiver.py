@@ -13,6 +13,14 @@ CHANNELS = 1
 FORMAT = pyaudio.paInt16
 RECORD_DIR = os.path.expanduser("~/records")
 GAIN = 10
+FLUSH_BYTES = 65536  # ~0.7 с аудио при 44.1 кГц
+RECV_BYTES = 16384   # крупный приёмный буфер: больше отсчётов на один recv_into
+
+# таблица усиления: для каждого из 65536 значений int16 заранее посчитан
+# насыщенный результат *GAIN; np.roll переиндексирует её так, что ключом
+# служит uint16-представление сэмпла, и весь чанк усиливается одним gather
+_lut = np.clip(np.arange(-32768, 32768, dtype=np.int32) * GAIN, -32768, 32767).astype(np.int16)
+lut_u = np.roll(_lut, 32768)
 
 p = pyaudio.PyAudio()
 
@@ -22,6 +30,8 @@ if not os.path.exists(RECORD_DIR):
 sock = socket.socket()
 try:
     sock.connect((PI_IP, PORT))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
     print(f"Connected to {PI_IP}. Recording audio...")
 except Exception as e:
     print(f"Failed to connect: {e}")
@@ -30,12 +40,25 @@ except Exception as e:
 current_minute = -1
 wave_file = None
 file_path = ""
+write_buf = bytearray()
+
+# приёмный буфер выделяется один раз, recv_into пишет прямо в него,
+# rx_arr — постоянная int16-обёртка над теми же байтами
+rx_buf = bytearray(RECV_BYTES)
+rx_view = memoryview(rx_buf)
+rx_arr = np.frombuffer(rx_buf, dtype=np.int16)
+
+def flush_write_buf():
+    if write_buf and wave_file:
+        wave_file.writeframesraw(bytes(write_buf))
+        write_buf.clear()
 
 try:
     while True:
         now = datetime.now()
         if now.minute != current_minute:
             if wave_file:
+                flush_write_buf()
                 wave_file.close()
                 print(f"Saved: {file_path}")
 
@@ -49,12 +72,14 @@ try:
             wave_file.setframerate(RATE)
             print(f"Recording to: {file_path}")
 
-        data = sock.recv(CHUNK * 2)
-        if data and wave_file:
-            audio_data = np.frombuffer(data, dtype=np.int16)
-            amplified_data = np.clip(audio_data.astype(np.int32) * GAIN, -32768, 32767)
-            final_data = amplified_data.astype(np.int16)
-            wave_file.writeframes(final_data.tobytes())
+        n = sock.recv_into(rx_view)
+        if n and wave_file:
+            audio_data = rx_arr[:n // 2]
+            final_data = lut_u[audio_data.view(np.uint16)]
+            # пишем на диск пачками, а не по одному recv за раз
+            write_buf += final_data.tobytes()
+            if len(write_buf) >= FLUSH_BYTES:
+                flush_write_buf()
         else:
             print("Stream ended.")
             break
@@ -64,6 +89,7 @@ except KeyboardInterrupt:
 finally:
     print("Cleaning up...")
     if wave_file:
+        flush_write_buf()
         wave_file.close()
         print(f"Saved: {file_path}")
     sock.close()
@@ -42,6 +42,9 @@ try:
     while True:
         print("Waiting for a client to connect...")
         conn, addr = server.accept()
+        # без Nagle мелкие аудио-чанки уходят сразу, а не копятся до 40 мс
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 20)
         print(f"Connected to client at {addr}")
 
         try: